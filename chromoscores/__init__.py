@@ -0,0 +1,31 @@
+"""
+chromoscores: scores and pileups for contact maps.
+
+Submodules are imported on first access, so `import chromoscores`
+does not import numpy or any optional dependency.
+"""
+
+import importlib
+
+_SUBMODULES = [
+    "ensemble",
+    "maputils",
+    "pipeline",
+    "results",
+    "scorefunctions",
+    "snipping",
+]
+
+__all__ = list(_SUBMODULES)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        module = importlib.import_module(f".{name}", __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES))
@@ -0,0 +1,156 @@
+import numpy as np
+
+from .scorefunctions import _check_regions, _flatten_scorer
+
+# number of rows of a replicate map accumulated at once
+_ROW_BLOCK_SIZE = 1024
+
+
+def _load_replicate(replicate):
+    """
+    parameters
+    ----------
+    replicate: contact map, or path to a .npy file holding a contact map
+
+    returns
+    -------
+    the contact map, memory-mapped if a path is given
+    """
+    if isinstance(replicate, np.ndarray):
+        return replicate
+    return np.load(replicate, mmap_mode="r")
+
+
+def reduce_replicates(replicates, scorers=None, ddof=0):
+    """
+    parameters
+    ----------
+    replicates: iterable of contact maps or paths to .npy files.
+                Paths are memory-mapped and each replicate is read once.
+    scorers: dictionary of (regions, score_functions) pairs as returned by
+             scorefunctions.peak_scorer, isolation_scorer or flame_scorer,
+             e.g. {'peak': peak_scorer(peaks)}
+    ddof: delta degrees of freedom of the variance
+
+    returns
+    -------
+    the mean map, the per-pixel variance map and a dictionary with the scores
+    of each replicate stacked along the first axis, for every entry of scorers.
+    Replicates are streamed in blocks of rows. The mean and variance are
+    accumulated with Welford's algorithm, and each snippet is scored from the
+    block holding its last row, with the last rows of the previous block kept
+    in memory for snippets spanning several blocks. Only a block of one
+    replicate is held in memory at a time and no row is read twice.
+    """
+    if scorers is None:
+        scorers = {}
+    if ddof < 0:
+        raise ValueError("ddof should not be negative")
+    if hasattr(replicates, "__len__") and len(replicates) - ddof <= 0:
+        raise ValueError(
+            "ddof should be smaller than the number of replicates"
+        )
+
+    flat_scorers = {
+        name: _flatten_scorer(*scorer) for name, scorer in scorers.items()
+    }
+    regions = np.concatenate(
+        [flat[0] for flat in flat_scorers.values()] + [np.zeros((0, 4), int)]
+    )
+    owners = np.concatenate(
+        [
+            np.full(len(flat[0]), k)
+            for k, flat in enumerate(flat_scorers.values())
+        ]
+        + [np.zeros(0, int)]
+    )
+    positions = np.concatenate(
+        [np.arange(len(flat[0])) for flat in flat_scorers.values()]
+        + [np.zeros(0, int)]
+    )
+    # each snippet is scored with the block holding its last row
+    last_rows = np.maximum(regions[:, 0], regions[:, 1] - 1)
+    order = np.argsort(last_rows, kind="stable")
+    regions, owners, positions = (
+        regions[order],
+        owners[order],
+        positions[order],
+    )
+    last_rows = last_rows[order]
+    carry_size = max(0, (regions[:, 1] - regions[:, 0]).max(initial=0))
+    functions = [flat[2] for flat in flat_scorers.values()]
+    kinds = [flat[1] for flat in flat_scorers.values()]
+
+    n_replicates = 0
+    mean = None
+    m2 = None
+    scores = {name: [] for name in scorers}
+    for replicate in replicates:
+        contact_map = _load_replicate(replicate)
+        if mean is None:
+            mean = np.zeros(np.shape(contact_map))
+            m2 = np.zeros(np.shape(contact_map))
+            _check_regions(regions, mean.shape)
+            block_ends = np.searchsorted(
+                last_rows,
+                np.arange(
+                    _ROW_BLOCK_SIZE,
+                    len(mean) + _ROW_BLOCK_SIZE,
+                    _ROW_BLOCK_SIZE,
+                ),
+                "left",
+            )
+        elif np.shape(contact_map) != mean.shape:
+            raise ValueError("replicates should have the same shape")
+
+        n_replicates += 1
+        replicate_scores = [
+            np.zeros(len(flat[0])) for flat in flat_scorers.values()
+        ]
+        carry = np.zeros((0, mean.shape[1]))
+        site_start = 0
+        for start, site_end in zip(
+            range(0, len(mean), _ROW_BLOCK_SIZE), block_ends
+        ):
+            block = np.asarray(
+                contact_map[start : start + _ROW_BLOCK_SIZE], dtype=np.float64
+            )
+            mean_block = mean[start : start + _ROW_BLOCK_SIZE]
+            delta = block - mean_block
+            mean_block += delta / n_replicates
+            m2[start : start + _ROW_BLOCK_SIZE] += delta * (block - mean_block)
+
+            if site_end > site_start:
+                buffer = np.concatenate([carry, block])
+                offset = start - len(carry)
+                for (r0, r1, c0, c1), owner, position in zip(
+                    regions[site_start:site_end].tolist(),
+                    owners[site_start:site_end],
+                    positions[site_start:site_end],
+                ):
+                    function = functions[owner][kinds[owner][position]]
+                    replicate_scores[owner][position] = function(
+                        buffer[r0 - offset : r1 - offset, c0:c1]
+                    )
+                site_start = site_end
+            if carry_size:
+                carry = np.concatenate([carry, block[-carry_size:]])[
+                    -carry_size:
+                ]
+
+        for (name, flat), value in zip(flat_scorers.items(), replicate_scores):
+            scores[name].append(value.reshape(flat[3]))
+
+    if n_replicates == 0:
+        raise ValueError("replicates should not be empty")
+    if n_replicates - ddof <= 0:
+        raise ValueError(
+            "ddof should be smaller than the number of replicates"
+        )
+
+    variance = m2 / (n_replicates - ddof)
+    return (
+        mean,
+        variance,
+        {name: np.array(value) for name, value in scores.items()},
+    )
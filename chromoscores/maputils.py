@@ -1,13 +1,374 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
 
-def get_diagonal_pileup(contact_map, boundary_list, window_size = 10):
+def _add_windows(mat, contact_map, rows, cols, labels, half):
+    """
+    parameters
+    ----------
+    mat: array of shape (n_labels, 2 * half, 2 * half) the windows are added to
+    contact_map: contact map, or a block of its rows
+    rows, cols: centers of the windows
+    labels: index of the pileup each window is added to
+    half: half size of the windows
+    """
+    for row, col, label in zip(rows.tolist(), cols.tolist(), labels.tolist()):
+        mat[label] += contact_map[row - half : row + half, col - half : col + half]
+
+
+def _add_windows_parallel(accumulators, contact_map, rows, cols, labels, half, pool):
+    """
+    parameters
+    ----------
+    accumulators: list of one private partial pileup per thread
+    contact_map: contact map, or a block of its rows
+    rows, cols: centers of the windows, sorted by row
+    labels: index of the pileup each window is added to
+    half: half size of the windows
+    pool: ThreadPoolExecutor, or None to add the windows in the calling thread
+
+    Thread k adds the k-th contiguous run of the windows to accumulators[k].
+    """
+    if pool is None:
+        _add_windows(accumulators[0], contact_map, rows, cols, labels, half)
+        return
+
+    bounds = np.linspace(0, len(rows), len(accumulators) + 1).astype(int)
+
+    def add_run(k):
+        run = slice(bounds[k], bounds[k + 1])
+        _add_windows(
+            accumulators[k], contact_map, rows[run], cols[run], labels[run], half
+        )
+
+    list(pool.map(add_run, range(len(accumulators))))
+
+
+def _get_pileups(
+    contact_map,
+    rows,
+    cols,
+    window_size,
+    labels=None,
+    n_labels=1,
+    n_threads=None,
+    block_size=None,
+    presorted=False,
+):
+    """
+    parameters
+    ----------
+    contact_map: contact map, possibly memory-mapped
+    rows, cols: positions of the snippet centers
+    window_size: size of the window for the pileup
+    labels: index of the pileup each snippet is added to (default: all 0)
+    n_labels: number of pileups
+    n_threads: number of threads summing the snippets, or None for a single thread
+    block_size: if given, read contact_map in blocks of block_size rows, each exactly once
+    presorted: True if the sites are already sorted by row, then by column
+
+    returns
+    -------
+    array of shape (n_labels, W, W) with the sums of the snippets of each label,
+    where W = 2 * (window_size // 2) as for the slices of the pileup loops.
+    Sites are sorted by row for cache locality. Each thread sums a contiguous run
+    of the sites into its own partial pileup, and the partials are merged in thread
+    order, so the result is deterministic for a given n_threads and memory is about
+    n_threads * n_labels * W**2 floats. With block_size, each site is summed
+    with the block holding the last row of its snippet; the last rows of the previous
+    block are kept in memory, so the map is read about (block_size + W) rows at a time.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    if labels is None:
+        labels = np.zeros(len(rows), dtype=np.int64)
+    labels = np.asarray(labels, dtype=np.int64)
+    half = window_size // 2
+    if len(rows) == 0:
+        return np.zeros((n_labels, 2 * half, 2 * half))
+
+    n_rows, n_cols = np.shape(contact_map)
+    if (
+        rows.min() - half < 0
+        or cols.min() - half < 0
+        or rows.max() + half > n_rows
+        or cols.max() + half > n_cols
+    ):
+        raise ValueError("snippets exceed the size of the contact map")
+    if block_size is not None and block_size <= 0:
+        raise ValueError("block_size must be larger than 0")
+
+    if not presorted:
+        order = np.lexsort((cols, rows))
+        rows, cols, labels = rows[order], cols[order], labels[order]
+
+    n_parts = 1 if n_threads is None else n_threads
+    accumulators = [
+        np.zeros((n_labels, 2 * half, 2 * half)) for _ in range(n_parts)
+    ]
+    pool = None if n_threads is None else ThreadPoolExecutor(max_workers=n_threads)
+    try:
+        if block_size is None:
+            # a plain ndarray view, so that slicing a memmap stays cheap
+            _add_windows_parallel(
+                accumulators, np.asarray(contact_map), rows, cols, labels, half, pool
+            )
+        else:
+            block_ends = np.searchsorted(
+                rows + half,
+                np.arange(block_size, n_rows + block_size, block_size),
+                "right",
+            )
+            carry = np.zeros((0, n_cols), dtype=contact_map.dtype)
+            site_start = 0
+            for block_start, site_end in zip(range(0, n_rows, block_size), block_ends):
+                block = np.concatenate(
+                    [
+                        carry,
+                        np.asarray(contact_map[block_start : block_start + block_size]),
+                    ]
+                )
+                offset = block_start - len(carry)
+                if site_end > site_start:
+                    _add_windows_parallel(
+                        accumulators,
+                        block,
+                        rows[site_start:site_end] - offset,
+                        cols[site_start:site_end],
+                        labels[site_start:site_end],
+                        half,
+                        pool,
+                    )
+                site_start = site_end
+                carry = block[max(0, len(block) - 2 * half) :]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    mat = np.zeros((n_labels, 2 * half, 2 * half))
+    for accumulator in accumulators:
+        mat += accumulator
+    return mat
+
+
+def _get_pair_indices(boundary_list, bin_start, bin_end):
+    """
+    parameters
+    ----------
+    boundary_list: list of the boundary elements positions on the diagonal
+    bin_start, bin_end: range [bin_start, bin_end) of the distance between elements
+
+    returns
+    -------
+    indices (i, j) into boundary_list of every pair with
+    bin_start <= boundary_list[j] - boundary_list[i] < bin_end,
+    ordered by the position of i then of j. Memory scales with the number of pairs.
+    """
+    boundary_list = np.asarray(boundary_list)
+    order = np.argsort(boundary_list, kind="stable")
+    positions = boundary_list[order]
+    j_start = np.searchsorted(positions, positions + bin_start, "left")
+    j_end = np.searchsorted(positions, positions + bin_end, "left")
+    n_pairs = np.maximum(j_end - j_start, 0)
+
+    i_sorted = np.repeat(np.arange(len(positions)), n_pairs)
+    pair_start = np.cumsum(n_pairs) - n_pairs
+    j_sorted = np.repeat(j_start - pair_start, n_pairs) + np.arange(n_pairs.sum())
+    return order[i_sorted], order[j_sorted]
+
+
+def _get_orientation_classes(boundary_list, orientation, i_index, j_index):
+    """
+    parameters
+    ----------
+    boundary_list: list of the boundary elements positions on the diagonal
+    orientation: list of the boundary element orientations
+    i_index, j_index: indices of the pairs into boundary_list
+
+    returns
+    -------
+    boolean masks of convergent ('+-'), divergent ('-+'), tandem '++' and tandem '--' pairs,
+    where the orientation of the downstream element is given first
+    """
+    boundary_list = np.asarray(boundary_list)
+    orientation = np.asarray(orientation)
+    downstream = boundary_list[j_index] >= boundary_list[i_index]
+    upper = orientation[np.where(downstream, j_index, i_index)] == "+"
+    lower_minus = orientation[np.where(downstream, i_index, j_index)] == "-"
+    lower_plus = orientation[np.where(downstream, i_index, j_index)] == "+"
+    conv = upper & lower_minus
+    tand_p = upper & ~lower_minus
+    dive = ~upper & lower_plus
+    tand_n = ~upper & ~lower_plus
+    return conv, dive, tand_p, tand_n
+
+
+_ORIENTATION_CLASSES = ["+-", "-+", "++", "--"]
+
+
+class PairIndex:
+    """
+    Pairs of boundary elements grouped by distance bins, computed once and reused
+    for the pileups of any number of contact maps with the same sites.
+
+    attributes
+    ----------
+    rows, cols: int32 arrays of the positions of the pairs, sorted by row then column
+    bins: int32 array of the bin of each pair
+    bin_borders: list of bin borders
+    classes: int8 array of the orientation class of each pair, indexing ['+-', '-+', '++', '--'],
+             or None if the orientation of the elements is not given
+    sites: positions of the boundary elements the index was built from
+    orientation: orientations of the boundary elements, or None
+    """
+
+    def __init__(
+        self, rows, cols, bins, bin_borders, sites, classes=None, orientation=None
+    ):
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.cols = np.asarray(cols, dtype=np.int32)
+        self.bins = np.asarray(bins, dtype=np.int32)
+        self.bin_borders = np.asarray(bin_borders)
+        self.sites = np.asarray(sites)
+        self.classes = None if classes is None else np.asarray(classes, dtype=np.int8)
+        self.orientation = (
+            None if orientation is None else np.asarray(orientation, dtype=str)
+        )
+
+        if not (len(self.rows) == len(self.cols) == len(self.bins)):
+            raise ValueError("rows, cols and bins do not match")
+        if self.classes is not None and len(self.classes) != len(self.rows):
+            raise ValueError("classes do not match the pairs")
+        if (self.classes is None) != (self.orientation is None):
+            raise ValueError("classes and orientation should be given together")
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def from_boundaries(cls, boundary_list, binlist, orientation=None):
+        """
+        parameters
+        ----------
+        boundary_list: list of the boundary elements positions on the diagonal
+        binlist: exact list of bin boundaries
+        orientation: list of the boundary element orientations (optional)
+
+        returns
+        -------
+        a PairIndex of every pair (i, j) of elements with binlist[k] <= j - i < binlist[k + 1]
+        """
+        boundary_list = np.asarray(boundary_list)
+        i_index, j_index, bins = [], [], []
+        for i in range(len(binlist) - 1):
+            i_bin, j_bin = _get_pair_indices(boundary_list, binlist[i], binlist[i + 1])
+            i_index.append(i_bin)
+            j_index.append(j_bin)
+            bins.append(np.full(len(i_bin), i))
+        i_index = np.concatenate(i_index).astype(np.int64)
+        j_index = np.concatenate(j_index).astype(np.int64)
+        bins = np.concatenate(bins)
+
+        order = np.lexsort((boundary_list[j_index], boundary_list[i_index]))
+        i_index, j_index, bins = i_index[order], j_index[order], bins[order]
+
+        classes = None
+        if orientation is not None:
+            classes = np.argmax(
+                _get_orientation_classes(boundary_list, orientation, i_index, j_index),
+                axis=0,
+            )
+        return cls(
+            boundary_list[i_index],
+            boundary_list[j_index],
+            bins,
+            binlist,
+            boundary_list,
+            classes,
+            orientation,
+        )
+
+    def check_bins(self, bin_borders):
+        """
+        parameters
+        ----------
+        bin_borders: list of bin borders requested by a pileup function
+
+        raises ValueError if the index was built for different bins
+        """
+        if not np.array_equal(self.bin_borders, bin_borders):
+            raise ValueError("pair_index was built for different bins")
+
+    def check_sites(self, boundary_list, orientation=None):
+        """
+        parameters
+        ----------
+        boundary_list: list of the boundary elements positions given to a pileup function
+        orientation: list of the boundary element orientations given to a pileup function
+
+        raises ValueError if the index was built for different boundary elements
+        """
+        if not np.array_equal(self.sites, boundary_list):
+            raise ValueError("pair_index was built for a different boundary_list")
+        if orientation is not None:
+            if self.orientation is None:
+                raise ValueError("pair_index was built without orientation")
+            if not np.array_equal(self.orientation, np.asarray(orientation, dtype=str)):
+                raise ValueError("pair_index was built for a different orientation")
+
+    def save(self, path):
+        """
+        parameters
+        ----------
+        path: path of the .npz file
+        """
+        arrays = dict(
+            rows=self.rows,
+            cols=self.cols,
+            bins=self.bins,
+            bin_borders=self.bin_borders,
+            sites=self.sites,
+        )
+        if self.classes is not None:
+            arrays["classes"] = self.classes
+            arrays["orientation"] = self.orientation
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        parameters
+        ----------
+        path: path of a .npz file written by PairIndex.save
+
+        returns
+        -------
+        a PairIndex
+        """
+        with np.load(path) as npz:
+            return cls(
+                npz["rows"],
+                npz["cols"],
+                npz["bins"],
+                npz["bin_borders"],
+                npz["sites"],
+                npz["classes"] if "classes" in npz.files else None,
+                npz["orientation"] if "orientation" in npz.files else None,
+            )
+
+
+def get_diagonal_pileup(
+    contact_map, boundary_list, window_size = 10, n_threads=None, block_size=None
+):
     """
     parameters
     ----------
     contact_map: contact map (2D array)
     boundary_list: list of the boundary elements' positions on the diagonal
     window_size: size of the window (must be odd for center)
+    n_threads: if given, sum the snippets with n_threads threads
+    block_size: if given, read the contact map in blocks of block_size rows, each exactly once
 
     Returns
     -------
@@ -18,6 +379,17 @@ def get_diagonal_pileup(contact_map, boundary_list, window_size = 10):
         raise ValueError("window_size must be larger than 0 and smaller than the size of the contact map")
     
     mat = np.zeros((window_size, window_size))
+    if n_threads is not None or block_size is not None:
+        mat += _get_pileups(
+            contact_map,
+            boundary_list,
+            boundary_list,
+            window_size,
+            n_threads=n_threads,
+            block_size=block_size,
+        )[0]
+        return mat
+
     for i in range(len(boundary_list)):
         mat += contact_map[
             boundary_list[i] - window_size // 2 : boundary_list[i] + window_size // 2,
@@ -27,7 +399,15 @@ def get_diagonal_pileup(contact_map, boundary_list, window_size = 10):
 
 
 def get_offdiagonal_pileup(
-    contact_map, boundary_list, min_dist, max_dist, bin_num = 5, window_size = 10
+    contact_map,
+    boundary_list,
+    min_dist,
+    max_dist,
+    bin_num = 5,
+    window_size = 10,
+    n_threads=None,
+    block_size=None,
+    pair_index=None,
 ):
     """
     parameters
@@ -38,6 +418,10 @@ def get_offdiagonal_pileup(
     max_dist: maximum distance from the diagonal
     bin_num: number of bins
     window_size: size of the window for the pileup
+    n_threads: if given, sum the snippets with n_threads threads
+    block_size: if given, read the contact map in blocks of block_size rows, each exactly once
+    pair_index: PairIndex of boundary_list for the same bins, built once with
+                PairIndex.from_boundaries and reused across contact maps
 
     Returns
     -------
@@ -52,6 +436,31 @@ def get_offdiagonal_pileup(
     bin_border_int = [int(x) for x in bin_borders]
 
     pile_ups = []
+    if pair_index is not None or n_threads is not None or block_size is not None:
+        if pair_index is None:
+            pair_index = PairIndex.from_boundaries(
+                boundary_list, bin_border_int[: bin_num + 1]
+            )
+        pair_index.check_bins(bin_border_int[: bin_num + 1])
+        pair_index.check_sites(boundary_list)
+        mats = _get_pileups(
+            contact_map,
+            pair_index.rows,
+            pair_index.cols,
+            window_size,
+            pair_index.bins,
+            bin_num,
+            n_threads=n_threads,
+            block_size=block_size,
+            presorted=True,
+        )
+        for i in range(bin_num):
+            mat = np.zeros((window_size, window_size))
+            mat += mats[i]
+            dist = (bin_border_int[i] + bin_border_int[i + 1]) / 2
+            pile_ups.append([dist, mat])
+        return pile_ups
+
     for i in range(bin_num):
         mat = np.zeros((window_size, window_size))
         dist = (bin_border_int[i] + bin_border_int[i + 1]) / 2
@@ -68,7 +477,13 @@ def get_offdiagonal_pileup(
     return pile_ups
 
 def get_offdiagonal_pileup_binlist(
-    contact_map, boundary_list, binlist, window_size=10
+    contact_map,
+    boundary_list,
+    binlist,
+    window_size=10,
+    n_threads=None,
+    block_size=None,
+    pair_index=None,
 ):
     """
     parameters
@@ -77,6 +492,10 @@ def get_offdiagonal_pileup_binlist(
     boundary_list: list of the boundary elements positions on the diagonal
     binlist : exact list of bin boundaries 
     window_size: size of the window for the pileup
+    n_threads: if given, sum the snippets with n_threads threads
+    block_size: if given, read the contact map in blocks of block_size rows, each exactly once
+    pair_index: PairIndex of boundary_list for the same bins, built once with
+                PairIndex.from_boundaries and reused across contact maps
 
     Returns
     -------
@@ -87,6 +506,29 @@ def get_offdiagonal_pileup_binlist(
     bin_num=len(bin_border_int)
 
     pile_ups = []
+    if pair_index is not None or n_threads is not None or block_size is not None:
+        if pair_index is None:
+            pair_index = PairIndex.from_boundaries(boundary_list, bin_border_int)
+        pair_index.check_bins(bin_border_int)
+        pair_index.check_sites(boundary_list)
+        mats = _get_pileups(
+            contact_map,
+            pair_index.rows,
+            pair_index.cols,
+            window_size,
+            pair_index.bins,
+            bin_num - 1,
+            n_threads=n_threads,
+            block_size=block_size,
+            presorted=True,
+        )
+        for i in range(bin_num - 1):
+            mat = np.zeros((window_size, window_size))
+            mat += mats[i]
+            dist = (bin_border_int[i] + bin_border_int[i + 1]) / 2
+            pile_ups.append([dist, mat])
+        return pile_ups
+
     for i in range(bin_num-1):
         mat = np.zeros((window_size, window_size))
         dist = (bin_border_int[i] + bin_border_int[i + 1]) / 2
@@ -103,7 +545,14 @@ def get_offdiagonal_pileup_binlist(
     return pile_ups
 
 def get_offdiagonal_pileup_binlist_orientation(
-    contact_map, boundary_list, orientation, binlist, window_size=10
+    contact_map,
+    boundary_list,
+    orientation,
+    binlist,
+    window_size=10,
+    n_threads=None,
+    block_size=None,
+    pair_index=None,
 ):
     """
     parameters
@@ -113,6 +562,10 @@ def get_offdiagonal_pileup_binlist_orientation(
     orientation: list of the boundary element orientations
     binlist: exact list of bins boundaries
     window_size: size of the window for the pileup
+    n_threads: if given, sum the snippets with n_threads threads
+    block_size: if given, read the contact map in blocks of block_size rows, each exactly once
+    pair_index: PairIndex of boundary_list for the same bins, built once with
+                PairIndex.from_boundaries and reused across contact maps
 
     Returns
     -------
@@ -123,7 +576,39 @@ def get_offdiagonal_pileup_binlist_orientation(
     bin_num = len(bin_border_int)
     
     pile_ups = []
-    
+    if pair_index is not None or n_threads is not None or block_size is not None:
+        if pair_index is None:
+            pair_index = PairIndex.from_boundaries(
+                boundary_list, bin_border_int, orientation
+            )
+        pair_index.check_bins(bin_border_int)
+        pair_index.check_sites(boundary_list, orientation)
+        labels = 4 * pair_index.bins + pair_index.classes
+        mats = _get_pileups(
+            contact_map,
+            pair_index.rows,
+            pair_index.cols,
+            window_size,
+            labels,
+            4 * (bin_num - 1),
+            n_threads=n_threads,
+            block_size=block_size,
+            presorted=True,
+        )
+        counts = np.bincount(labels, minlength=4 * (bin_num - 1))
+        for i in range(bin_num - 1):
+            dist = (bin_border_int[i] + bin_border_int[i + 1]) / 2
+            entries = []
+            for k, name in enumerate(_ORIENTATION_CLASSES):
+                mat = np.zeros((window_size, window_size))
+                mat += mats[4 * i + k]
+                entries.append([name, dist, mat, int(counts[4 * i + k])])
+            mat = np.zeros((window_size, window_size))
+            mat += mats[4 * i : 4 * i + 4].sum(axis=0)
+            entries.append(["all", dist, mat, int(counts[4 * i : 4 * i + 4].sum())])
+            pile_ups.append(entries)
+        return pile_ups
+
     for i in range(bin_num-1):
         mat = np.zeros((window_size, window_size))
         mat_conv = np.zeros((window_size, window_size))
@@ -175,11 +660,81 @@ def get_offdiagonal_pileup_binlist_orientation(
     return pile_ups
 
 
-def get_observed_over_expected(contact_map):
+def _get_diagonal_means_chunked(contact_map, block_size):
+    """
+    parameters
+    ----------
+    contact_map: contact map, possibly memory-mapped
+    block_size: number of rows read at once
+
+    returns
+    -------
+    the mean of each diagonal of the upper triangle of contact_map
+    """
+    size = len(contact_map)
+    sums = np.zeros(size)
+    for start in range(0, size, block_size):
+        block = np.asarray(
+            contact_map[start : start + block_size, start:], dtype=np.float64
+        )
+        rows = np.arange(start, start + len(block))[:, None]
+        diags = np.arange(start, size)[None, :] - rows
+        upper = diags >= 0
+        sums += np.bincount(diags[upper], weights=block[upper], minlength=size)
+    return sums / np.arange(size, 0, -1)
+
+
+def _get_observed_over_expected_chunked(contact_map, block_size, output):
+    """
+    parameters
+    ----------
+    contact_map: contact map, possibly memory-mapped
+    block_size: number of rows read and written at once
+    output: array or path of the .npy file the normalized map is written to
+
+    returns
+    -------
+    the normalized contact map of get_observed_over_expected, written to output
+    in two passes over row blocks of contact_map. Only the upper triangle of each
+    row block is read. As in the dense loop, the lower triangle of the output mirrors
+    the upper triangle: each normalized row block is also written, transposed, to the
+    columns of the output below it.
+    """
+    size = len(contact_map)
+    if not isinstance(output, np.ndarray):
+        output = np.lib.format.open_memmap(
+            output, mode="w+", dtype=np.float64, shape=(size, size)
+        )
+    elif output.shape != (size, size):
+        raise ValueError("output should have the shape of the contact map")
+
+    expected = _get_diagonal_means_chunked(contact_map, block_size)
+    for start in range(0, size, block_size):
+        end = min(start + block_size, size)
+        rows = np.arange(start, end)[:, None]
+        cols = np.arange(start, size)[None, :]
+        observed = np.asarray(contact_map[start:end, start:], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            normalized = observed / expected[np.abs(cols - rows)]
+        square = normalized[:, : end - start]
+        square[:] = np.where(cols[:, : end - start] >= rows, square, square.T)
+        output[start:end, start:] = normalized
+        output[end:, start:end] = normalized[:, end - start :].T
+    if isinstance(output, np.memmap):
+        output.flush()
+    return output
+
+
+def get_observed_over_expected(contact_map, block_size=None, output=None):
     """
     parameters
     ----------
     contact_map: contact map
+    block_size: if given, process contact_map in blocks of block_size rows, so that
+                memory is bounded by the block size rather than by the size of the map.
+                Use with a memory-mapped contact_map for maps larger than RAM.
+    output: with block_size, an array or the path of a .npy file the result is written to.
+            Required when block_size is given.
 
     Returns
     -------
@@ -187,6 +742,15 @@ def get_observed_over_expected(contact_map):
 
     note: compare it with cooltools implementation. 
     """
+    if block_size is not None:
+        if block_size <= 0:
+            raise ValueError("block_size must be larger than 0")
+        if output is None:
+            raise ValueError("output is required when block_size is given")
+        return _get_observed_over_expected_chunked(contact_map, block_size, output)
+    if output is not None:
+        raise ValueError("output can only be given with block_size")
+
     mat = np.zeros(np.shape(contact_map))
     for i in range(len(contact_map)):
         for j in range(len(contact_map) - i):
@@ -0,0 +1,80 @@
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# end marker of the paths, which may themselves be None
+_END = object()
+
+
+def load_map(path):
+    """
+    parameters
+    ----------
+    path: path to a .npy file, or a .npz file whose first array is the contact map
+
+    returns
+    -------
+    the contact map, read (and decompressed) into memory
+    """
+    data = np.load(path)
+    if isinstance(data, np.lib.npyio.NpzFile):
+        with data:
+            return data[data.files[0]]
+    return data
+
+
+def run_pipeline(
+    paths, score_functions, prefetch=2, n_io_threads=1, load_function=load_map
+):
+    """
+    parameters
+    ----------
+    paths: list of paths of the contact maps
+    score_functions: dictionary of functions taking a contact map and returning scores, e.g.
+                     {'isolation': functools.partial(isolation_scores, boundary_list=sites)}
+    prefetch: number of maps loaded in the background while the current map is scored
+    n_io_threads: number of threads loading maps
+    load_function: function loading a contact map from a path
+
+    returns
+    -------
+    a dictionary with the list of the scores of every map for each entry of score_functions,
+    and a dictionary of timings in seconds: 'stall' is the time spent waiting for maps
+    to be loaded, 'total' the time of the whole pipeline.
+    At most prefetch maps are loaded ahead of the map being scored, which bounds
+    the number of maps held in memory to prefetch + 1.
+    """
+    if prefetch < 1:
+        raise ValueError("prefetch must be at least 1")
+
+    start = time.perf_counter()
+    stall = 0.0
+    scores = {name: [] for name in score_functions}
+    paths = iter(paths)
+    pending = collections.deque()
+    pool = ThreadPoolExecutor(max_workers=n_io_threads)
+    try:
+        for path in paths:
+            pending.append(pool.submit(load_function, path))
+            if len(pending) == prefetch:
+                break
+
+        while pending:
+            wait_start = time.perf_counter()
+            contact_map = pending.popleft().result()
+            stall += time.perf_counter() - wait_start
+
+            # refill the queue before scoring, so the next load overlaps with compute
+            path = next(paths, _END)
+            if path is not _END:
+                pending.append(pool.submit(load_function, path))
+
+            for name, score_function in score_functions.items():
+                scores[name].append(score_function(contact_map))
+            del contact_map
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return scores, {"stall": stall, "total": time.perf_counter() - start}
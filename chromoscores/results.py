@@ -0,0 +1,406 @@
+import zipfile
+
+import numpy as np
+
+
+def _load_npz(path, mmap=True):
+    """
+    parameters
+    ----------
+    path: path to an uncompressed .npz file
+    mmap: if True, memory-map the arrays instead of reading them
+
+    returns
+    -------
+    dictionary of the arrays stored in the file.
+    Memory-mapped arrays are views on the file, so loading does not copy the data.
+    Compressed members are read into memory.
+    """
+    if not mmap:
+        with np.load(path) as npz:
+            return {name: npz[name] for name in npz.files}
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as handle:
+        for info in archive.infolist():
+            name = info.filename[: -len(".npy")]
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            # local file header: 30 bytes, then the file name and the extra field
+            handle.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(
+                handle.read(4), dtype="<u2"
+            )
+            handle.seek(info.header_offset + 30 + name_length + extra_length)
+            if np.lib.format.read_magic(handle) == (1, 0):
+                read_header = np.lib.format.read_array_header_1_0
+            else:
+                read_header = np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(handle)
+            if dtype.hasobject or 0 in shape:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            arrays[name] = np.memmap(
+                path,
+                dtype=dtype,
+                mode="r",
+                offset=handle.tell(),
+                shape=shape,
+                order="F" if fortran_order else "C",
+            )
+    return arrays
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise ImportError("pyarrow is required to save and load Arrow files")
+    return pyarrow
+
+
+class PileupResults:
+    """
+    Array-backed container of the pileups of one or more contact maps.
+
+    attributes
+    ----------
+    pileups: array of shape (maps, classes, bins, window_size, window_size)
+    counts: array of shape (maps, classes, bins) of the number of snippets in each pileup,
+            -1 where the pileup function does not report it
+    classes: array of the orientation classes, e.g. ['+-', '-+', '++', '--', 'all']
+    distances: array of the distances of the bins from the diagonal
+    map_ids: array of the identifiers of the maps
+    """
+
+    def __init__(self, pileups, counts, classes, distances, map_ids):
+        pileups = np.asanyarray(pileups)
+        counts = np.asanyarray(counts)
+        map_ids = np.asarray(map_ids)
+        self.classes = np.asarray(classes, dtype=str)
+        self.distances = np.asarray(distances, dtype=float)
+
+        if pileups.ndim != 5:
+            raise ValueError(
+                "pileups should have shape (maps, classes, bins, W, W)"
+            )
+        if counts.shape != pileups.shape[:3]:
+            raise ValueError("counts should have shape (maps, classes, bins)")
+        if pileups.shape[1:3] != (len(self.classes), len(self.distances)):
+            raise ValueError("classes and distances do not match the pileups")
+        if len(map_ids) != len(pileups):
+            raise ValueError("map_ids do not match the pileups")
+
+        self._chunks = {
+            "pileups": [pileups],
+            "counts": [counts],
+            "map_ids": [map_ids],
+        }
+
+    def __len__(self):
+        return sum(len(map_ids) for map_ids in self._chunks["map_ids"])
+
+    def _get(self, name):
+        chunks = self._chunks[name]
+        if len(chunks) > 1:
+            chunks[:] = [np.concatenate(chunks)]
+        return chunks[0]
+
+    @property
+    def pileups(self):
+        return self._get("pileups")
+
+    @property
+    def counts(self):
+        return self._get("counts")
+
+    @property
+    def map_ids(self):
+        return self._get("map_ids")
+
+    @classmethod
+    def from_pileup_list(cls, pile_ups, map_id=0):
+        """
+        parameters
+        ----------
+        pile_ups: output of one of the maputils off-diagonal pileup functions,
+                  either [[dist, mat], ...] or [[[class, dist, mat, n], ...], ...]
+        map_id: identifier of the contact map
+
+        returns
+        -------
+        a PileupResults holding the pileups of one map
+        """
+        if len(pile_ups) == 0:
+            raise ValueError("pile_ups should not be empty")
+
+        if isinstance(pile_ups[0][0], (list, tuple)):
+            classes = [entry[0] for entry in pile_ups[0]]
+            distances = [bin_entries[0][1] for bin_entries in pile_ups]
+            pileups = [
+                [bin_entries[k][2] for bin_entries in pile_ups]
+                for k in range(len(classes))
+            ]
+            counts = [
+                [bin_entries[k][3] for bin_entries in pile_ups]
+                for k in range(len(classes))
+            ]
+        else:
+            classes = ["all"]
+            distances = [dist for dist, mat in pile_ups]
+            pileups = [[mat for dist, mat in pile_ups]]
+            counts = [[-1] * len(pile_ups)]
+
+        return cls(
+            np.asarray(pileups)[None],
+            np.asarray(counts, dtype=np.int64)[None],
+            classes,
+            distances,
+            [map_id],
+        )
+
+    @classmethod
+    def concatenate(cls, results):
+        """
+        parameters
+        ----------
+        results: list of PileupResults with the same classes and distances
+
+        returns
+        -------
+        a PileupResults holding the maps of all results
+        """
+        if len(results) == 0:
+            raise ValueError("results should not be empty")
+        concatenated = cls(
+            results[0].pileups,
+            results[0].counts,
+            results[0].classes,
+            results[0].distances,
+            results[0].map_ids,
+        )
+        for result in results[1:]:
+            concatenated.append(result)
+        return concatenated
+
+    def append(self, other):
+        """
+        parameters
+        ----------
+        other: PileupResults with the same classes and distances, whose maps are added
+               after the maps of self. Appended maps are kept as separate chunks and
+               concatenated once, when the arrays are next accessed.
+        """
+        if not (
+            np.array_equal(other.classes, self.classes)
+            and np.array_equal(other.distances, self.distances)
+        ):
+            raise ValueError(
+                "results should have the same classes and distances"
+            )
+        pileups = self._chunks["pileups"][0]
+        if other.pileups.shape[1:] != pileups.shape[1:]:
+            raise ValueError("results should have the same window size")
+        if other.counts.shape[1:] != self._chunks["counts"][0].shape[1:]:
+            raise ValueError("results should have the same counts shape")
+        if other.map_ids.dtype.kind != self._chunks["map_ids"][0].dtype.kind:
+            raise ValueError("results should have map_ids of the same type")
+        for name in self._chunks:
+            self._chunks[name].append(other._get(name))
+
+    def to_pileup_list(self, map_index=0):
+        """
+        parameters
+        ----------
+        map_index: index of the map
+
+        returns
+        -------
+        the pileups of the map in the nested list format of the maputils pileup functions:
+        [[dist, mat], ...] if the pileups were built from that format,
+        [[[class, dist, mat, n], ...], ...] otherwise
+        """
+        pileups = self.pileups[map_index]
+        counts = self.counts[map_index]
+        if list(self.classes) == ["all"] and np.all(counts == -1):
+            return [
+                [self.distances[b], pileups[0, b]]
+                for b in range(len(self.distances))
+            ]
+
+        return [
+            [
+                [
+                    self.classes[k],
+                    self.distances[b],
+                    pileups[k, b],
+                    counts[k, b],
+                ]
+                for k in range(len(self.classes))
+            ]
+            for b in range(len(self.distances))
+        ]
+
+    def save(self, path):
+        """
+        parameters
+        ----------
+        path: path of the uncompressed .npz file
+        """
+        np.savez(
+            path,
+            pileups=self.pileups,
+            counts=self.counts,
+            classes=self.classes,
+            distances=self.distances,
+            map_ids=self.map_ids,
+        )
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        parameters
+        ----------
+        path: path of a .npz file written by PileupResults.save
+        mmap: if True, memory-map the pileups instead of reading them
+
+        returns
+        -------
+        a PileupResults
+        """
+        arrays = _load_npz(path, mmap=mmap)
+        return cls(
+            arrays["pileups"],
+            arrays["counts"],
+            arrays["classes"],
+            arrays["distances"],
+            arrays["map_ids"],
+        )
+
+
+class ScoreTable:
+    """
+    Columnar table of scores, e.g. one row per site and map.
+
+    attributes
+    ----------
+    columns: dictionary of the column names and one-dimensional arrays of the same length
+    """
+
+    def __init__(self, columns=None):
+        self._chunks = {}
+        self._length = 0
+        if columns:
+            self.append(**columns)
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def column_names(self):
+        return list(self._chunks)
+
+    @property
+    def columns(self):
+        return {name: self[name] for name in self._chunks}
+
+    def __getitem__(self, name):
+        chunks = self._chunks[name]
+        if len(chunks) > 1:
+            chunks[:] = [np.concatenate(chunks)]
+        return chunks[0]
+
+    def append(self, **columns):
+        """
+        parameters
+        ----------
+        columns: values of the new rows of each column, as one-dimensional arrays or scalars
+                 repeated over the new rows. All columns of the table should be given.
+        """
+        if not columns:
+            raise ValueError("columns should not be empty")
+        columns = {
+            name: np.asanyarray(value) for name, value in columns.items()
+        }
+        lengths = {len(value) for value in columns.values() if value.ndim > 0}
+        if len(lengths) > 1:
+            raise ValueError("columns should have the same length")
+        length = lengths.pop() if lengths else 1
+        columns = {
+            name: np.full(length, value) if value.ndim == 0 else value
+            for name, value in columns.items()
+        }
+        if self._chunks and set(columns) != set(self._chunks):
+            raise ValueError("columns should match the columns of the table")
+
+        for name, value in columns.items():
+            self._chunks.setdefault(name, []).append(value)
+        self._length += length
+
+    def save(self, path):
+        """
+        parameters
+        ----------
+        path: path of the uncompressed .npz file
+        """
+        np.savez(path, **self.columns)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        parameters
+        ----------
+        path: path of a .npz file written by ScoreTable.save
+        mmap: if True, memory-map the columns instead of reading them
+
+        returns
+        -------
+        a ScoreTable
+        """
+        return cls(_load_npz(path, mmap=mmap))
+
+    def to_arrow(self):
+        """
+        returns
+        -------
+        a pyarrow.Table with the columns of the table
+        """
+        pyarrow = _import_pyarrow()
+        return pyarrow.table(self.columns)
+
+    def save_arrow(self, path):
+        """
+        parameters
+        ----------
+        path: path of the Arrow IPC file
+        """
+        pyarrow = _import_pyarrow()
+        table = self.to_arrow()
+        with pyarrow.OSFile(str(path), "wb") as sink:
+            with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    @classmethod
+    def load_arrow(cls, path):
+        """
+        parameters
+        ----------
+        path: path of an Arrow IPC file written by ScoreTable.save_arrow
+
+        returns
+        -------
+        a ScoreTable whose numeric columns are views on the memory-mapped file when possible
+        """
+        pyarrow = _import_pyarrow()
+        with pyarrow.memory_map(str(path), "r") as source:
+            table = pyarrow.ipc.open_file(source).read_all()
+        return cls(
+            {
+                name: table.column(name).to_numpy()
+                for name in table.column_names
+            }
+        )
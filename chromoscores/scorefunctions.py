@@ -1,3 +1,5 @@
+import functools
+
 import numpy as np
 
 
@@ -288,6 +290,105 @@ def isolation_score(snippet, delta, diag_offset, max_dist, snippet_shapes , pseu
     )
 
 
+"""TAD scores"""
+
+
+def _get_diagonal_band_cumsum(contact_map, min_diag, max_diag):
+    """
+    parameters
+    ----------
+    contact_map: contact map
+    min_diag: first diagonal of the band
+    max_diag: last diagonal of the band (inclusive)
+
+    returns
+    -------
+    an array of shape (N + 1, max_diag - min_diag + 1) whose column k holds the
+    cumulative sum of diagonal min_diag + k, indexed by the row of the pixel
+    """
+    n = len(contact_map)
+    band = np.zeros((n + 1, max_diag - min_diag + 1))
+    for k, diag in enumerate(range(min_diag, min(max_diag, n - 1) + 1)):
+        band[1 : n - diag + 1, k] = np.cumsum(np.diagonal(contact_map, diag))
+    return band
+
+
+def _get_band_rectangle_sums(band_cumsum, min_diag, row_lo, row_hi, col_lo, col_hi):
+    """
+    parameters
+    ----------
+    band_cumsum: output of _get_diagonal_band_cumsum
+    min_diag: first diagonal of the band
+    row_lo, row_hi: row range [row_lo, row_hi) of each rectangle
+    col_lo, col_hi: column range [col_lo, col_hi) of each rectangle
+
+    returns
+    -------
+    sums and pixel counts of each rectangle restricted to the diagonal band
+    """
+    diags = min_diag + np.arange(band_cumsum.shape[1])
+    lo = np.maximum(row_lo[:, None], col_lo[:, None] - diags[None, :])
+    hi = np.minimum(row_hi[:, None], col_hi[:, None] - diags[None, :])
+    hi = np.maximum(hi, lo)
+    cols = np.arange(band_cumsum.shape[1])[None, :]
+    sums = (band_cumsum[hi, cols] - band_cumsum[lo, cols]).sum(axis=1)
+    counts = (hi - lo).sum(axis=1)
+    return sums, counts
+
+
+def tad_sector_scores(
+    contact_map, boundary_list, delta, diag_offset, max_distance, pseudo_count=0
+):
+    """
+    parameters
+    ----------
+    contact_map: contact map
+    boundary_list: sorted list of the boundary elements positions on the diagonal
+    delta: distance from the border between in_tad and out_tad. It is defined to exclude
+           flames when extracting in_tad and out_tad areas.
+    diag_offset: distance from the diagonal
+    max_distance: maximum distance from the diagonal
+    pseudo_count: pseudo count to avoid division by zero
+
+    returns
+    -------
+    mean of the areas inside tads, mean of the area outside tads and their ratio
+    for every consecutive triplet of boundary elements, i.e. the areas given by
+    snipping.tad_snippet_sectors for index = 0, ..., len(boundary_list) - 3.
+    Triplets with an empty area give nan.
+    """
+    boundary_list = np.asarray(boundary_list, dtype=int)
+    if len(boundary_list) < 3:
+        raise ValueError("boundary_list should have at least three elements")
+    if np.any(np.diff(boundary_list) < 0):
+        raise ValueError("boundary_list should be sorted")
+    if boundary_list[0] < 0 or boundary_list[-1] >= len(contact_map):
+        raise ValueError("boundary_list exceeds the size of the contact map")
+    if diag_offset < 0 or max_distance < diag_offset:
+        raise ValueError("diag_offset should be between 0 and max_distance")
+
+    left = boundary_list[:-2]
+    mid = boundary_list[1:-1] + 1
+    right = boundary_list[2:] + 1
+
+    band_cumsum = _get_diagonal_band_cumsum(contact_map, diag_offset, max_distance)
+    in_left, n_in_left = _get_band_rectangle_sums(
+        band_cumsum, diag_offset, left + delta, mid - delta, left + delta, mid - delta
+    )
+    in_right, n_in_right = _get_band_rectangle_sums(
+        band_cumsum, diag_offset, mid + delta, right - delta, mid + delta, right - delta
+    )
+    out_tad, n_out = _get_band_rectangle_sums(
+        band_cumsum, diag_offset, left + delta, mid - delta, mid + delta, right - delta
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        in_mean = (in_left + in_right) / (n_in_left + n_in_right)
+        out_mean = out_tad / n_out
+        ratio = (pseudo_count + in_mean) / (pseudo_count + out_mean)
+    return in_mean, out_mean, ratio
+
+
 """Flame scores"""
 
 
@@ -352,3 +453,322 @@ def flame_score_horizontal(
     )
 
     return flame_interior / flame_background
+
+
+"""Batched scores"""
+
+
+def _flatten_scorer(regions, score_functions):
+    """
+    parameters
+    ----------
+    regions: int array of shape (n_sites, 4) or (n_sites, k, 4) of snippet bounds
+             [row_start, row_end, col_start, col_end)
+    score_functions: function scoring a snippet, or list of k functions, one per
+                     second axis of regions
+
+    returns
+    -------
+    regions as an (n, 4) array, the index of the function of each region,
+    the list of functions and the shape of the scores
+    """
+    regions = np.asarray(regions, dtype=np.int64)
+    if regions.ndim == 2:
+        return (
+            regions,
+            np.zeros(len(regions), dtype=np.int64),
+            [score_functions],
+            regions.shape[:-1],
+        )
+    if len(score_functions) != regions.shape[1]:
+        raise ValueError("one score function is needed per kind of snippet")
+    return (
+        regions.reshape(-1, 4),
+        np.tile(np.arange(regions.shape[1]), len(regions)),
+        list(score_functions),
+        regions.shape[:-1],
+    )
+
+
+def _check_regions(regions, shape):
+    """
+    parameters
+    ----------
+    regions: int array of shape (n, 4) of snippet bounds
+    shape: shape of the contact map
+
+    raises ValueError if a snippet exceeds the contact map
+    """
+    if len(regions) and (
+        regions[:, [0, 2]].min() < 0
+        or regions[:, [0, 1]].max() > shape[0]
+        or regions[:, [2, 3]].max() > shape[1]
+    ):
+        raise ValueError("snippets exceed the size of the contact map")
+
+
+def score_snippets(contact_map, regions, score_functions):
+    """
+    parameters
+    ----------
+    contact_map: contact map
+    regions: int array of shape (n_sites, 4) or (n_sites, k, 4) of snippet bounds
+             [row_start, row_end, col_start, col_end), e.g. from peak_scorer
+    score_functions: function scoring a snippet, or list of k functions, one per
+                     second axis of regions
+
+    returns
+    -------
+    array of shape regions.shape[:-1] of the scores of the snippets
+    """
+    regions, kinds, functions, shape = _flatten_scorer(
+        regions, score_functions
+    )
+    _check_regions(regions, np.shape(contact_map))
+    scores = np.array(
+        [
+            functions[kind](contact_map[r0:r1, c0:c1])
+            for (r0, r1, c0, c1), kind in zip(regions.tolist(), kinds)
+        ],
+        dtype=float,
+    )
+    return scores.reshape(shape)
+
+
+def peak_scorer(
+    peak_coordinates,
+    window_size=10,
+    peak_width=3,
+    background_width=10,
+    pseudo_count=0,
+):
+    """
+    parameters
+    ----------
+    peak_coordinates: list of peak coordinates in (i,j) format
+    window_size: size of the window around each peak
+    peak_width: width of the peak
+    background_width: width of the background outside the peak but inside the snippet
+    pseudo_count: pseudo count to avoid division by zero
+
+    returns
+    -------
+    the snippet bounds of snipping.peak_snipping around each peak and the function
+    scoring them with peak_score
+    """
+    peaks = np.asarray(peak_coordinates, dtype=np.int64).reshape(-1, 2)
+    regions = np.stack(
+        [
+            peaks[:, 0] - window_size,
+            peaks[:, 0] + window_size,
+            peaks[:, 1] - window_size,
+            peaks[:, 1] + window_size,
+        ],
+        axis=-1,
+    )
+    return regions, functools.partial(
+        peak_score,
+        peak_width=peak_width,
+        background_width=background_width,
+        pseudo_count=pseudo_count,
+    )
+
+
+def isolation_scorer(
+    boundary_list,
+    delta=1,
+    diag_offset=3,
+    max_dist=10,
+    snippet_shapes="triangle",
+    pseudo_count=0,
+):
+    """
+    parameters
+    ----------
+    boundary_list: list of the boundary elements positions on the diagonal
+    delta: distance from the border between in_tad and out_tad
+    diag_offset: distance from the diagonal
+    max_dist: maximum distance from the diagonal
+    snippet_shapes: shape of the snippet for taking the average
+    pseudo_count: pseudo count to avoid division by zero
+
+    returns
+    -------
+    the bounds of the snippets centered on each boundary element and the function
+    scoring them with isolation_score
+    """
+    half = 2 * (diag_offset + delta)
+    boundaries = np.asarray(boundary_list, dtype=np.int64)
+    regions = np.stack(
+        [
+            boundaries - half,
+            boundaries + half + 1,
+            boundaries - half,
+            boundaries + half + 1,
+        ],
+        axis=-1,
+    )
+    return regions, functools.partial(
+        isolation_score,
+        delta=delta,
+        diag_offset=diag_offset,
+        max_dist=max_dist,
+        snippet_shapes=snippet_shapes,
+        pseudo_count=pseudo_count,
+    )
+
+
+def flame_scorer(
+    boundary_list,
+    width,
+    edge,
+    flame_thickness,
+    background_thickness,
+    pseudo_count=1,
+):
+    """
+    parameters
+    ----------
+    boundary_list: list of the boundary elements positions on the diagonal
+    width: width of the flame snippets
+    edge: excluded areas at the ends of the flame
+    flame_thickness: thickness of the flame
+    background_thickness: thickness of the background outside the flame but inside the snippet
+    pseudo_count: pseudo count to avoid division by zero
+
+    returns
+    -------
+    the bounds of the vertical and horizontal flame snippets of snipping.flame_snipping_*
+    for every index of the boundary_list except the last one, and the functions scoring them
+    """
+    boundaries = np.asarray(boundary_list, dtype=np.int64)
+    left, right = boundaries[:-1], boundaries[1:]
+    vertical = np.stack(
+        [left + edge, right - edge, right - width, right + width], axis=-1
+    )
+    horizontal = np.stack(
+        [left - width, left + width, left + edge, right - edge], axis=-1
+    )
+    return np.stack([vertical, horizontal], axis=1), [
+        functools.partial(
+            flame_score_vertical,
+            flame_thickness=flame_thickness,
+            background_thickness=background_thickness,
+            pseudo_count=pseudo_count,
+        ),
+        functools.partial(
+            flame_score_horizontal,
+            flame_thickness=flame_thickness,
+            background_thickness=background_thickness,
+            pseudo_count=pseudo_count,
+        ),
+    ]
+
+
+def peak_scores(
+    contact_map,
+    peak_coordinates,
+    window_size=10,
+    peak_width=3,
+    background_width=10,
+    pseudo_count=0,
+):
+    """
+    parameters
+    ----------
+    contact_map: contact map
+    peak_coordinates: list of peak coordinates in (i,j) format
+    window_size: size of the window around each peak
+    peak_width: width of the peak
+    background_width: width of the background outside the peak but inside the snippet
+    pseudo_count: pseudo count to avoid division by zero
+
+    returns
+    -------
+    array of the peak scores of the peaks
+    """
+    return score_snippets(
+        contact_map,
+        *peak_scorer(
+            peak_coordinates,
+            window_size=window_size,
+            peak_width=peak_width,
+            background_width=background_width,
+            pseudo_count=pseudo_count,
+        ),
+    )
+
+
+def isolation_scores(
+    contact_map,
+    boundary_list,
+    delta=1,
+    diag_offset=3,
+    max_dist=10,
+    snippet_shapes="triangle",
+    pseudo_count=0,
+):
+    """
+    parameters
+    ----------
+    contact_map: contact map
+    boundary_list: list of the boundary elements positions on the diagonal
+    delta: distance from the border between in_tad and out_tad
+    diag_offset: distance from the diagonal
+    max_dist: maximum distance from the diagonal
+    snippet_shapes: shape of the snippet for taking the average
+    pseudo_count: pseudo count to avoid division by zero
+
+    returns
+    -------
+    array of the isolation scores of the boundary elements
+    """
+    return score_snippets(
+        contact_map,
+        *isolation_scorer(
+            boundary_list,
+            delta=delta,
+            diag_offset=diag_offset,
+            max_dist=max_dist,
+            snippet_shapes=snippet_shapes,
+            pseudo_count=pseudo_count,
+        ),
+    )
+
+
+def flame_scores(
+    contact_map,
+    boundary_list,
+    width,
+    edge,
+    flame_thickness,
+    background_thickness,
+    pseudo_count=1,
+):
+    """
+    parameters
+    ----------
+    contact_map: contact map
+    boundary_list: list of the boundary elements positions on the diagonal
+    width: width of the flame snippets
+    edge: excluded areas at the ends of the flame
+    flame_thickness: thickness of the flame
+    background_thickness: thickness of the background outside the flame but inside the snippet
+    pseudo_count: pseudo count to avoid division by zero
+
+    returns
+    -------
+    array of shape (len(boundary_list) - 1, 2) of the vertical and horizontal flame scores
+    for every index of the boundary_list except the last one
+    """
+    return score_snippets(
+        contact_map,
+        *flame_scorer(
+            boundary_list,
+            width,
+            edge,
+            flame_thickness,
+            background_thickness,
+            pseudo_count=pseudo_count,
+        ),
+    )
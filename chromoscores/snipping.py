@@ -69,6 +69,9 @@ def tad_snippet_sectors(
     -------
     areas with a size of diag_offset inside and outside a tad
     """
+    if index + 2 > len(boundary_list) - 1:
+        raise ValueError("index + 2 should be in the range of boundary list")
+
     tad = tad_snipping(contact_map, boundary_list, index)
     tad_window_size = len(tad)
 
@@ -77,9 +80,6 @@ def tad_snippet_sectors(
         boundary_list[index] : boundary_list[index + 2] + 1,
     ]
 
-    if index + 1 > len(boundary_list):
-        raise ValueError("index + 1 should be in the range of boundary list")
-
     if max_distance > len(pile_center) // 2:
         raise ValueError("max distance exceeds tad snippet window_size")
     
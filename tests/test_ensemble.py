@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from chromoscores import ensemble
+from chromoscores.ensemble import reduce_replicates
+from chromoscores.scorefunctions import (
+    flame_score_horizontal,
+    flame_score_vertical,
+    flame_scorer,
+    flame_scores,
+    isolation_scorer,
+    isolation_scores,
+    peak_score,
+    peak_scorer,
+    peak_scores,
+)
+from chromoscores.snipping import (
+    flame_snipping_horizontal,
+    flame_snipping_vertical,
+    peak_snipping,
+)
+
+
+def test_reduce_replicates(monkeypatch):
+    # small blocks, so that snippets span several blocks
+    monkeypatch.setattr(ensemble, "_ROW_BLOCK_SIZE", 7)
+    rng = np.random.default_rng(0)
+    replicates = rng.random((4, 60, 60))
+    paths = []
+    for i, replicate in enumerate(replicates):
+        np.save(f"replicate_{i}.npy", replicate)
+        paths.append(f"replicate_{i}.npy")
+
+    boundary_list = np.array([15, 30, 45])
+    scorers = {
+        "peak": peak_scorer([(20, 40), (12, 50)], background_width=5),
+        "isolation": isolation_scorer(boundary_list),
+        "flame": flame_scorer(
+            boundary_list,
+            width=4,
+            edge=1,
+            flame_thickness=2,
+            background_thickness=6,
+        ),
+    }
+    mean, variance, scores = reduce_replicates(paths, scorers, ddof=1)
+
+    assert np.allclose(mean, replicates.mean(axis=0))
+    assert np.allclose(variance, replicates.var(axis=0, ddof=1))
+    assert scores["peak"].shape == (4, 2)
+    assert scores["isolation"].shape == (4, 3)
+    assert scores["flame"].shape == (4, 2, 2)
+    for i, replicate in enumerate(replicates):
+        assert np.allclose(
+            scores["isolation"][i], isolation_scores(replicate, boundary_list)
+        )
+        assert np.allclose(
+            scores["peak"][i],
+            peak_scores(replicate, [(20, 40), (12, 50)], background_width=5),
+        )
+        assert np.isclose(
+            scores["peak"][i, 0],
+            peak_score(
+                peak_snipping(replicate, 10, (20, 40)), background_width=5
+            ),
+        )
+        assert np.allclose(
+            scores["flame"][i],
+            flame_scores(replicate, boundary_list, 4, 1, 2, 6),
+        )
+        for index in range(len(boundary_list) - 1):
+            assert np.isclose(
+                scores["flame"][i, index, 0],
+                flame_score_vertical(
+                    flame_snipping_vertical(
+                        replicate, boundary_list, index, 4, 1
+                    ),
+                    2,
+                    6,
+                ),
+            )
+            assert np.isclose(
+                scores["flame"][i, index, 1],
+                flame_score_horizontal(
+                    flame_snipping_horizontal(
+                        replicate, boundary_list, index, 4, 1
+                    ),
+                    2,
+                    6,
+                ),
+            )
+
+
+def test_reduce_replicates_reads_once(monkeypatch):
+    monkeypatch.setattr(ensemble, "_ROW_BLOCK_SIZE", 7)
+    rng = np.random.default_rng(1)
+    replicates = rng.random((2, 40, 40))
+    rows_read = []
+
+    class Replicate(np.ndarray):
+        def __getitem__(self, index):
+            rows_read.append(index)
+            return super().__getitem__(index)
+
+    _, _, scores = reduce_replicates(
+        [replicate.view(Replicate) for replicate in replicates],
+        {"isolation": isolation_scorer([10, 20, 30])},
+    )
+
+    blocks = [slice(start, start + 7) for start in range(0, 40, 7)]
+    assert rows_read == blocks * 2
+    for i, replicate in enumerate(replicates):
+        assert np.allclose(
+            scores["isolation"][i], isolation_scores(replicate, [10, 20, 30])
+        )
+
+
+def test_reduce_replicates_checks():
+    contact_map = np.ones((30, 30))
+    with pytest.raises(ValueError):
+        isolation_scores(contact_map, [3])
+    with pytest.raises(ValueError):
+        isolation_scores(contact_map, [25])
+    with pytest.raises(ValueError):
+        reduce_replicates([contact_map], {"isolation": isolation_scorer([25])})
+
+    def replicates():
+        raise AssertionError("replicates should not be consumed")
+        yield
+
+    with pytest.raises(ValueError):
+        reduce_replicates([contact_map, contact_map], ddof=2)
+    with pytest.raises(ValueError):
+        reduce_replicates(replicates(), ddof=-1)
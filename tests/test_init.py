@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+import chromoscores
+
+# budgets for a bare `import chromoscores` in a fresh interpreter
+IMPORT_TIME_BUDGET = 0.5
+NEW_MODULES_BUDGET = 20
+
+
+def test_import_is_lightweight():
+    code = (
+        "import json, sys, time\n"
+        "before = set(sys.modules)\n"
+        "start = time.perf_counter()\n"
+        "import chromoscores\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps([elapsed, sorted(set(sys.modules) - before)]))\n"
+    )
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.path.dirname(os.path.dirname(chromoscores.__file__)),
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    ).stdout
+    elapsed, new_modules = json.loads(output)
+
+    assert elapsed < IMPORT_TIME_BUDGET
+    assert len(new_modules) <= NEW_MODULES_BUDGET
+    for heavy in [
+        "numpy",
+        "scipy",
+        "matplotlib",
+        "pyarrow",
+        "concurrent.futures",
+    ]:
+        assert heavy not in new_modules
+    assert not any(name.startswith("chromoscores.") for name in new_modules)
+
+
+def test_lazy_submodules():
+    assert chromoscores.maputils.get_diagonal_pileup
+    assert chromoscores.snipping.peak_snipping
+    assert chromoscores.scorefunctions.peak_score
+    assert "scorefunctions" in dir(chromoscores)
@@ -0,0 +1,230 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from chromoscores import maputils
+from chromoscores.maputils import (
+    _get_pair_indices,
+    get_diagonal_pileup,
+    get_offdiagonal_pileup_binlist,
+    get_offdiagonal_pileup_binlist_orientation,
+)
+
+rng = np.random.default_rng(0)
+contact_map = rng.random((200, 200))
+boundary_list = np.sort(rng.choice(np.arange(10, 190), size=30, replace=False))
+orientation = rng.choice(["+", "-"], size=30)
+binlist = [0, 20, 50, 100]
+
+
+def test_diagonal_pileup_threaded():
+    mat = get_diagonal_pileup(contact_map, boundary_list, window_size=10)
+    for n_threads in [1, 2, 4]:
+        mat_threaded = get_diagonal_pileup(
+            contact_map, boundary_list, window_size=10, n_threads=n_threads
+        )
+        assert np.allclose(mat, mat_threaded)
+        # partials are merged in thread order, so repeated runs are bit-identical
+        for _ in range(3):
+            assert np.array_equal(
+                mat_threaded,
+                get_diagonal_pileup(
+                    contact_map,
+                    boundary_list,
+                    window_size=10,
+                    n_threads=n_threads,
+                ),
+            )
+
+
+def test_pileup_memory_is_bounded():
+    n_labels, window_size, n_sites, n_threads = 2000, 20, 50000, 2
+    rows = rng.integers(10, 190, n_sites)
+    cols = rng.integers(10, 190, n_sites)
+    labels = rng.integers(0, n_labels, n_sites)
+    partial_size = n_labels * window_size**2 * 8
+
+    tracemalloc.start()
+    mats = maputils._get_pileups(
+        contact_map,
+        rows,
+        cols,
+        window_size,
+        labels,
+        n_labels,
+        n_threads=n_threads,
+    )
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert peak < (n_threads + 3) * partial_size
+    assert np.allclose(
+        mats.sum(axis=0),
+        maputils._get_pileups(contact_map, rows, cols, window_size)[0],
+    )
+
+
+def test_pair_indices():
+    positions = np.array([40, 3, 17, 3, 25, 60, 33])
+    for bin_start, bin_end in [(0, 10), (5, 30), (-20, 0), (100, 200)]:
+        expected = {
+            (i, j)
+            for i in range(len(positions))
+            for j in range(len(positions))
+            if bin_start <= positions[j] - positions[i] < bin_end
+        }
+        i_index, j_index = _get_pair_indices(positions, bin_start, bin_end)
+        assert len(i_index) == len(expected)
+        assert set(zip(i_index, j_index)) == expected
+
+
+def test_offdiagonal_pileup_threaded():
+    pile_ups = get_offdiagonal_pileup_binlist(
+        contact_map, boundary_list, binlist
+    )
+    pile_ups_threaded = get_offdiagonal_pileup_binlist(
+        contact_map, boundary_list, binlist, n_threads=3
+    )
+    for (dist, mat), (dist_threaded, mat_threaded) in zip(
+        pile_ups, pile_ups_threaded
+    ):
+        assert dist == dist_threaded
+        assert np.allclose(mat, mat_threaded)
+
+
+def test_offdiagonal_pileup_orientation_threaded():
+    pile_ups = get_offdiagonal_pileup_binlist_orientation(
+        contact_map, boundary_list, orientation, binlist
+    )
+    pile_ups_threaded = get_offdiagonal_pileup_binlist_orientation(
+        contact_map, boundary_list, orientation, binlist, n_threads=3
+    )
+    for classes, classes_threaded in zip(pile_ups, pile_ups_threaded):
+        for (name, dist, mat, n), (
+            name_t,
+            dist_t,
+            mat_t,
+            n_t,
+        ) in zip(classes, classes_threaded):
+            assert (name, dist, n) == (name_t, dist_t, n_t)
+            assert np.allclose(mat, mat_t)
+
+
+def test_observed_over_expected_chunked():
+    from chromoscores.maputils import get_observed_over_expected
+
+    small_map = contact_map[:60, :60] + 1
+    np.save("contact_map.npy", small_map)
+    on_disk = np.load("contact_map.npy", mmap_mode="r")
+    oe = get_observed_over_expected(small_map)
+    oe_chunked = get_observed_over_expected(
+        on_disk, block_size=7, output="oe.npy"
+    )
+    assert np.allclose(oe, oe_chunked)
+    assert np.allclose(oe, np.load("oe.npy"))
+
+
+def test_pileup_blocks():
+    on_disk_path = "contact_map.npy"
+    np.save(on_disk_path, contact_map)
+    on_disk = np.load(on_disk_path, mmap_mode="r")
+    mat = get_diagonal_pileup(contact_map, boundary_list, window_size=10)
+    for block_size in [4, 33, 500]:
+        assert np.allclose(
+            mat,
+            get_diagonal_pileup(
+                on_disk, boundary_list, window_size=10, block_size=block_size
+            ),
+        )
+
+    pile_ups = get_offdiagonal_pileup_binlist_orientation(
+        contact_map, boundary_list, orientation, binlist
+    )
+    pile_ups_blocks = get_offdiagonal_pileup_binlist_orientation(
+        on_disk,
+        boundary_list,
+        orientation,
+        binlist,
+        block_size=16,
+        n_threads=2,
+    )
+    for classes, classes_blocks in zip(pile_ups, pile_ups_blocks):
+        for (name, dist, mat, n), (name_b, dist_b, mat_b, n_b) in zip(
+            classes, classes_blocks
+        ):
+            assert (name, dist, n) == (name_b, dist_b, n_b)
+            assert np.allclose(mat, mat_b)
+
+
+def test_pair_index():
+    from chromoscores.maputils import PairIndex
+
+    pair_index = PairIndex.from_boundaries(boundary_list, binlist, orientation)
+    pair_index.save("pair_index.npz")
+    pair_index = PairIndex.load("pair_index.npz")
+    assert pair_index.rows.dtype == np.int32
+    order = np.lexsort((pair_index.cols, pair_index.rows))
+    assert np.array_equal(order, np.arange(len(pair_index)))
+
+    for scale in [1, 2]:
+        pile_ups = get_offdiagonal_pileup_binlist_orientation(
+            scale * contact_map, boundary_list, orientation, binlist
+        )
+        pile_ups_indexed = get_offdiagonal_pileup_binlist_orientation(
+            scale * contact_map,
+            boundary_list,
+            orientation,
+            binlist,
+            pair_index=pair_index,
+        )
+        for classes, classes_indexed in zip(pile_ups, pile_ups_indexed):
+            for (name, dist, mat, n), (name_i, dist_i, mat_i, n_i) in zip(
+                classes, classes_indexed
+            ):
+                assert (name, dist, n) == (name_i, dist_i, n_i)
+                assert np.allclose(mat, mat_i)
+
+    pile_ups = get_offdiagonal_pileup_binlist(
+        contact_map, boundary_list, binlist
+    )
+    pile_ups_indexed = get_offdiagonal_pileup_binlist(
+        contact_map, boundary_list, binlist, pair_index=pair_index
+    )
+    for (dist, mat), (dist_i, mat_i) in zip(pile_ups, pile_ups_indexed):
+        assert dist == dist_i
+        assert np.allclose(mat, mat_i)
+
+    with pytest.raises(ValueError):
+        get_offdiagonal_pileup_binlist(
+            contact_map, boundary_list, [0, 10], pair_index=pair_index
+        )
+    with pytest.raises(ValueError):
+        get_offdiagonal_pileup_binlist(
+            contact_map, boundary_list + 1, binlist, pair_index=pair_index
+        )
+    with pytest.raises(ValueError):
+        get_offdiagonal_pileup_binlist_orientation(
+            contact_map,
+            boundary_list,
+            orientation[::-1],
+            binlist,
+            pair_index=pair_index,
+        )
+    with pytest.raises(ValueError):
+        get_offdiagonal_pileup_binlist_orientation(
+            contact_map,
+            boundary_list,
+            orientation,
+            binlist,
+            pair_index=PairIndex.from_boundaries(boundary_list, binlist),
+        )
+
+
+def test_observed_over_expected_chunked_arguments():
+    from chromoscores.maputils import get_observed_over_expected
+
+    with pytest.raises(ValueError):
+        get_observed_over_expected(contact_map, block_size=10)
+    with pytest.raises(ValueError):
+        get_observed_over_expected(contact_map, output="oe.npy")
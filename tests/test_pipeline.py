@@ -0,0 +1,89 @@
+import functools
+import threading
+
+import numpy as np
+import pytest
+
+from chromoscores.maputils import get_diagonal_pileup
+from chromoscores.pipeline import load_map, run_pipeline
+from chromoscores.scorefunctions import isolation_scores
+
+
+def test_run_pipeline():
+    rng = np.random.default_rng(0)
+    maps = rng.random((5, 50, 50))
+    paths = []
+    for i, contact_map in enumerate(maps):
+        path = f"map_{i}.npz" if i % 2 else f"map_{i}.npy"
+        if i % 2:
+            np.savez_compressed(path, contact_map)
+        else:
+            np.save(path, contact_map)
+        paths.append(path)
+
+    boundary_list = [15, 25, 35]
+    score_functions = {
+        "isolation": functools.partial(
+            isolation_scores, boundary_list=boundary_list
+        ),
+        "pileup": functools.partial(
+            get_diagonal_pileup, boundary_list=boundary_list
+        ),
+    }
+    scores, timings = run_pipeline(paths, score_functions, prefetch=2)
+
+    assert len(scores["isolation"]) == 5
+    for contact_map, isolation, pileup in zip(
+        maps, scores["isolation"], scores["pileup"]
+    ):
+        assert np.allclose(
+            isolation, isolation_scores(contact_map, boundary_list)
+        )
+        assert np.allclose(
+            pileup, get_diagonal_pileup(contact_map, boundary_list)
+        )
+    assert 0 <= timings["stall"] <= timings["total"]
+
+
+def test_run_pipeline_backpressure():
+    loaded = []
+    in_flight = []
+    lock = threading.Lock()
+
+    def load_function(path):
+        with lock:
+            loaded.append(path)
+            in_flight.append(len(loaded) - len(scored))
+        return np.zeros((4, 4))
+
+    scored = []
+
+    def score_function(contact_map):
+        scored.append(1)
+        return 0
+
+    run_pipeline(
+        range(10),
+        {"zero": score_function},
+        prefetch=3,
+        load_function=load_function,
+    )
+    assert len(loaded) == 10
+    assert max(in_flight) <= 3 + 1
+
+
+def test_load_map_errors():
+    with pytest.raises(FileNotFoundError):
+        run_pipeline(["missing.npy"], {"sum": np.sum}, load_function=load_map)
+
+
+def test_run_pipeline_none_paths():
+    # None is a valid item of paths and should not end the pipeline
+    keys = ["a", None, "b", None]
+    scores, _ = run_pipeline(
+        keys,
+        {"shape": np.shape},
+        prefetch=1,
+        load_function=lambda key: np.zeros((len(str(key)), 1)),
+    )
+    assert scores["shape"] == [(1, 1), (4, 1), (1, 1), (4, 1)]
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from chromoscores.maputils import (
+    get_offdiagonal_pileup_binlist,
+    get_offdiagonal_pileup_binlist_orientation,
+)
+from chromoscores.results import PileupResults, ScoreTable
+
+rng = np.random.default_rng(0)
+contact_map = rng.random((100, 100))
+boundary_list = np.array([10, 25, 40, 60, 85])
+orientation = np.array(["+", "-", "+", "+", "-"])
+pile_ups = get_offdiagonal_pileup_binlist_orientation(
+    contact_map, boundary_list, orientation, [0, 20, 50]
+)
+
+
+def test_pileup_results_roundtrip():
+    results = PileupResults.from_pileup_list(pile_ups, map_id="a")
+    results.append(PileupResults.from_pileup_list(pile_ups, map_id="b"))
+    assert len(results) == 2
+    assert results.pileups.shape == (2, 5, 2, 10, 10)
+    assert list(results.classes) == ["+-", "-+", "++", "--", "all"]
+
+    results.save("pileups.npz")
+    loaded = PileupResults.load("pileups.npz")
+    assert isinstance(loaded.pileups, np.memmap)
+    assert np.array_equal(loaded.pileups, results.pileups)
+    assert list(loaded.map_ids) == ["a", "b"]
+    for entries, loaded_entries in zip(pile_ups, loaded.to_pileup_list(1)):
+        for (name, dist, mat, n), (name_l, dist_l, mat_l, n_l) in zip(
+            entries, loaded_entries
+        ):
+            assert (name, dist, n) == (name_l, dist_l, n_l)
+            assert np.array_equal(mat, mat_l)
+
+
+def test_pileup_results_binlist_roundtrip():
+    binlist_pile_ups = get_offdiagonal_pileup_binlist(
+        contact_map, boundary_list, [0, 20, 50]
+    )
+    results = PileupResults.concatenate(
+        [
+            PileupResults.from_pileup_list(binlist_pile_ups, map_id=i)
+            for i in range(3)
+        ]
+    )
+    assert results.pileups.shape == (3, 1, 2, 10, 10)
+    for (dist, mat), (dist_r, mat_r) in zip(
+        binlist_pile_ups, results.to_pileup_list(2)
+    ):
+        assert dist == dist_r
+        assert np.array_equal(mat, mat_r)
+
+
+def test_pileup_results_append_checks():
+    results = PileupResults.from_pileup_list(pile_ups, map_id=0)
+    small_window = get_offdiagonal_pileup_binlist_orientation(
+        contact_map, boundary_list, orientation, [0, 20, 50], window_size=6
+    )
+    with pytest.raises(ValueError):
+        results.append(PileupResults.from_pileup_list(small_window, map_id=1))
+    with pytest.raises(ValueError):
+        results.append(PileupResults.from_pileup_list(pile_ups, map_id="x"))
+    assert len(results) == 1
+    assert results.map_ids.dtype.kind == "i"
+
+
+def test_score_table():
+    table = ScoreTable()
+    table.append(map_id="a", site=np.arange(3), score=np.ones(3))
+    table.append(map_id="b", site=np.arange(3), score=np.zeros(3))
+    assert len(table) == 6
+    assert list(table["map_id"]) == ["a"] * 3 + ["b"] * 3
+    with pytest.raises(ValueError):
+        table.append(score=1.0)
+    with pytest.raises(ValueError):
+        ScoreTable().append()
+
+    table.save("scores.npz")
+    loaded = ScoreTable.load("scores.npz")
+    assert np.array_equal(loaded["score"], table["score"])
+    assert np.array_equal(loaded["map_id"], table["map_id"])
+
+
+def test_score_table_arrow():
+    pytest.importorskip("pyarrow")
+    table = ScoreTable({"site": np.arange(3), "score": np.ones(3)})
+    table.save_arrow("scores.arrow")
+    loaded = ScoreTable.load_arrow("scores.arrow")
+    assert np.array_equal(loaded["score"], table["score"])
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from chromoscores.scorefunctions import tad_sector_scores
+from chromoscores.snipping import tad_snippet_sectors
+
+
+def test_tad_sector_scores_matches_snippet_sectors():
+    rng = np.random.default_rng(0)
+    contact_map = rng.random((120, 120))
+    contact_map = contact_map + contact_map.T
+    boundary_list = np.array([5, 30, 42, 70, 95, 118])
+    delta, diag_offset, max_distance = 2, 3, 12
+
+    in_mean, out_mean, ratio = tad_sector_scores(
+        contact_map,
+        boundary_list,
+        delta,
+        diag_offset,
+        max_distance,
+        pseudo_count=1,
+    )
+    assert len(ratio) == len(boundary_list) - 2
+    for index in range(len(boundary_list) - 2):
+        in_tad, out_tad, pile_center = tad_snippet_sectors(
+            contact_map, boundary_list, index, delta, diag_offset, max_distance
+        )
+        assert np.isclose(in_mean[index], pile_center[in_tad].mean())
+        assert np.isclose(out_mean[index], pile_center[out_tad].mean())
+        assert np.isclose(
+            ratio[index],
+            (1 + pile_center[in_tad].mean())
+            / (1 + pile_center[out_tad].mean()),
+        )
+
+
+def test_tad_sector_scores_checks_boundaries():
+    contact_map = np.ones((20, 20))
+    with pytest.raises(ValueError):
+        tad_sector_scores(contact_map, [2, 10], 1, 1, 5)
+    with pytest.raises(ValueError):
+        tad_sector_scores(contact_map, [10, 2, 15], 1, 1, 5)
+    with pytest.raises(ValueError):
+        tad_sector_scores(contact_map, [5, 10, 25], 1, 1, 5)
+    with pytest.raises(ValueError):
+        tad_sector_scores(contact_map, [-1, 10, 15], 1, 1, 5)